@@ -1,22 +1,137 @@
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import unicodedata
-from difflib import get_close_matches
+from difflib import SequenceMatcher
 import os
-from datetime import datetime
-from collections import OrderedDict
+import gc
+import time
+import threading
+from datetime import datetime, timezone, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, Counter, namedtuple
+import heapq
+import itertools
+import marshal
+import hashlib
+import sys
+from array import array
+import mmap
+import struct
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; the shared snapshot is disabled there
+    fcntl = None
 import json
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+import gzip
+import zlib
+try:
+    import brotli
+except ImportError:  # optional; only gzip is offered without it
+    brotli = None
+from urllib.parse import urlsplit
+
+# Serialize to UTF-8 JSON bytes, compact unless pretty. Uses orjson when installed,
+# otherwise the stdlib encoder (C-accelerated for compact output). Dicts keep their
+# insertion order with either.
+if orjson is not None:
+    def dumps(obj, pretty=False):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+else:
+    compact_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    pretty_encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+    def dumps(obj, pretty=False):
+        return (pretty_encoder if pretty else compact_encoder).encode(obj).encode()
+
+# Route jsonify() through the same encoder
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+
+# Content codings offered for JSON responses, most preferred first. Bodies smaller
+# than COMPRESS_MIN_SIZE are sent as-is.
+CONTENT_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 512))
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+# Coding to send a body of the given size (None when streamed) in, per the request's
+# Accept-Encoding, or None for identity
+def negotiate_encoding(size=None):
+    if size is not None and size < COMPRESS_MIN_SIZE:
+        return None
+    return request.accept_encodings.best_match(CONTENT_ENCODINGS)
 
-# Custom JSON encoder to preserve order
-class OrderedJSONEncoder(json.JSONEncoder):
-    def encode(self, obj):
-        if isinstance(obj, OrderedDict):
-            return '{' + ','.join(f'"{k}":{self.encode(v)}' for k, v in obj.items()) + '}'
-        return super().encode(obj)
+# Compress a stream chunk by chunk, flushing after each so a client can decode every
+# chunk as soon as it arrives
+def compress_stream(chunks, encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
 
-app.json_encoder = OrderedJSONEncoder
+# Streamed response in the negotiated coding; returns (response, encoding)
+def streamed_response(chunks, mimetype):
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return Flask.response_class(chunks, mimetype=mimetype), None
+    response = Flask.response_class(compress_stream(chunks, encoding), mimetype=mimetype)
+    response.headers['Content-Encoding'] = encoding
+    return response, encoding
+
+# Response bytes plus each compressed variant, compressed on first use
+class EncodedBody:
+    def __init__(self, data):
+        self.data = data
+        self.variants = {}
+
+    def get(self, encoding):
+        if encoding is None:
+            return self.data
+        body = self.variants.get(encoding)
+        if body is None:
+            body = self.variants[encoding] = compress(self.data, encoding)
+        return body
+
+    def size(self):
+        return len(self.data) + sum(len(body) for body in self.variants.values())
+
+# Compress JSON responses that were not already encoded by their view (streamed ones
+# are compressed as they are generated, see streamed_response)
+@app.after_request
+def compress_response(response):
+    response.vary.add('Accept-Encoding')
+    if (response.mimetype != 'application/json' or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or not 200 <= response.status_code < 300):
+        return response
+    data = response.get_data()
+    encoding = negotiate_encoding(len(data))
+    if encoding is not None:
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
 
 # Health check endpoint
 @app.route('/')
@@ -28,6 +143,35 @@ def health_check():
 def test():
     return jsonify({"message": "API is working!", "test": "success"})
 
+# Readiness endpoint: 200 only once the snapshot and its indexes are built and warm
+# (build_snapshot warms every snapshot before it is published). Until then each probe
+# starts a background load (rate-limited after failures), so a worker whose preload
+# failed or was skipped becomes ready without any /compare traffic.
+@app.route('/ready')
+def readiness_check():
+    snapshot = fpl_cache.value
+    if snapshot is None:
+        fpl_cache.refresh_in_background()
+        return jsonify({"status": "warming"}), 503
+    return jsonify({
+        "status": "ready",
+        "snapshot_version": snapshot.version,
+        "history_loaded": snapshot.h2h is not EMPTY_H2H_INDEX,
+        "history_complete": snapshot.h2h.complete
+    })
+
+# Cache statistics endpoint
+@app.route('/stats')
+def stats():
+    snapshot = fpl_cache.value
+    return jsonify({
+        "fpl_cache": fpl_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "upstream": upstream.stats(),
+        "compare_cache": compare_cache.stats(),
+        "refresh_schedule": snapshot.schedule.describe(time.time()) if snapshot else None
+    })
+
 # Normalize name for matching
 def normalize(text):
     text = unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode("utf-8")
@@ -42,71 +186,344 @@ fdr_labels = {
     5: "Likely To Lose"
 }
 
-# Load historical match data from openfootball
-def load_historical_data():
+# Upstream HTTP settings (timeouts in seconds)
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 3.05))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 10))
+UPSTREAM_RETRIES = int(os.environ.get('UPSTREAM_RETRIES', 2))
+UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 4))
+
+FPL_BOOTSTRAP_URL = "https://fantasy.premierleague.com/api/bootstrap-static/"
+FPL_FIXTURES_URL = "https://fantasy.premierleague.com/api/fixtures/"
+
+# Shared client for FPL and openfootball calls. One pooled keep-alive session means
+# refreshes reuse warm TCP/TLS connections instead of reconnecting every time.
+class UpstreamClient:
+    def __init__(self, connect_timeout, read_timeout, retries, pool_size):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.pool_size = pool_size
+        self.session = self.new_session()
+
+        self.lock = threading.Lock()
+        self.host_stats = {}
+
+    def new_session(self):
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+            # A 429's Retry-After can ask for hours, and a refresh holds the single-flight
+            # and the shared refresh lock while it sleeps; use the short backoff instead
+            respect_retry_after_header=False
+        )
+        # pool_connections is the number of hosts kept warm, pool_maxsize the
+        # connections kept per host
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    # A forked worker must not share the parent's pooled sockets; start a clean pool
+    def reset(self):
+        self.session = self.new_session()
+
+    # Fetch and parse a JSON resource, returning (payload, validators) where validators
+    # are the (ETag, Last-Modified, body size) of the response, or None if it had
+    # neither header. Passing the validators of the copy the caller already holds
+    # makes the request conditional, and a 304 returns (None, validators) without
+    # reading or parsing a body. Validators are not kept here: the caller stores them
+    # with the data they describe, so a copy that was fetched but never used can't
+    # turn a later change into a 304.
+    def get_json(self, url, validators=None):
+        headers = {}
+        if validators:
+            etag, last_modified, _ = validators
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        response = self.session.get(url, timeout=self.timeout, headers=headers)
+
+        if response.status_code == 304 and validators:
+            self.record(url, not_modified=True, size=validators[2])
+            return None, validators
+
+        response.raise_for_status()
+        payload = response.json()
+        size = len(response.content)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        self.record(url, not_modified=False, size=size)
+        return payload, ((etag, last_modified, size) if etag or last_modified else None)
+
+    def record(self, url, not_modified, size):
+        host = urlsplit(url).netloc
+        with self.lock:
+            stats = self.host_stats.setdefault(host, Counter())
+            stats['requests'] += 1
+            if not_modified:
+                stats['not_modified'] += 1
+                stats['bytes_saved'] += size
+            else:
+                stats['bytes_downloaded'] += size
+
+    def stats(self):
+        with self.lock:
+            return {host: dict(stats) for host, stats in self.host_stats.items()}
+
+upstream = UpstreamClient(UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT, UPSTREAM_RETRIES, UPSTREAM_POOL_SIZE)
+
+# Run independent loaders at the same time and return their results in order.
+# A loader that raises re-raises here, once every loader has finished.
+def run_concurrently(*loaders):
+    if len(loaders) == 1:
+        return [loaders[0]()]
+    with ThreadPoolExecutor(max_workers=len(loaders)) as pool:
+        futures = [pool.submit(loader) for loader in loaders]
+        return [future.result() for future in futures]
+
+# One in-progress call per key; callers arriving while it runs wait for its result
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+# Single-flight coalescing: when a resource is cold or expired, exactly one caller
+# refreshes it and every concurrent caller for the same key shares that result.
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.flights = Counter()
+        self.absorbed = Counter()
+        self.last_absorbed = {}
+        self.max_absorbed = Counter()
+
+    def do(self, key, fn):
+        with self.lock:
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+                self.flights[key] += 1
+                self.absorbed[key] += flight.waiters
+                self.last_absorbed[key] = flight.waiters
+                self.max_absorbed[key] = max(self.max_absorbed[key], flight.waiters)
+            flight.done.set()
+
+    def stats(self):
+        with self.lock:
+            return {
+                key: {
+                    "flights": self.flights[key],
+                    "absorbed": self.absorbed[key],
+                    "last_absorbed": self.last_absorbed[key],
+                    "max_absorbed": self.max_absorbed[key],
+                    "in_flight": key in self.in_flight
+                }
+                for key in self.flights
+            }
+
+single_flight = SingleFlight()
+
+# Completed openfootball seasons used for head-to-head data: (season code, label)
+historical_seasons = [
+    ("2023-24", "2023/24"),
+    ("2022-23", "2022/23")
+]
+
+# Completed seasons never change, so each one is downloaded once into this directory.
+# Layout mirrors the openfootball repo (<dir>/<season>/en.1.json) so it can be pre-seeded.
+HISTORY_CACHE_DIR = os.environ.get(
+    'HISTORY_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'history')
+)
+
+# Set HISTORY_OFFLINE=1 to only ever read pre-seeded files (CI, benchmarks)
+HISTORY_OFFLINE = os.environ.get('HISTORY_OFFLINE', '0') == '1'
+
+# Load one season, from the on-disk cache if present, otherwise from GitHub
+def load_season(season_code):
+    path = os.path.join(HISTORY_CACHE_DIR, season_code, 'en.1.json')
     try:
-        # Load last two seasons
-        seasons = [
-            ("2023-24", "2023/24"),
-            ("2022-23", "2022/23")
-        ]
-        
-        all_matches = []
-        for season_code, season_name in seasons:
-            url = f"https://raw.githubusercontent.com/openfootball/football.json/master/{season_code}/en.1.json"
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                for match in data.get('matches', []):
-                    if 'score' in match and 'ft' in match['score']:
-                        match['season'] = season_name
-                        all_matches.append(match)
-        
-        return all_matches
-    except Exception as e:
-        print(f"Error loading historical data: {e}")
-        return []
+        with open(path, encoding='utf-8') as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        print(f"Ignoring corrupt cached season {path}: {e}")
+
+    if HISTORY_OFFLINE:
+        print(f"Season {season_code} not cached at {path} and HISTORY_OFFLINE is set")
+        return None
+
+    url = f"https://raw.githubusercontent.com/openfootball/football.json/master/{season_code}/en.1.json"
+    data, _ = upstream.get_json(url)
+
+    # Write to a temp file and rename so concurrent workers never read a partial file
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Unable to cache season {season_code}: {e}")
+    return data
+
+# Load historical match data from openfootball, all seasons at once, as (matches,
+# seasons loaded). A season that fails to load is skipped so head-to-head degrades
+# instead of failing; callers retry until every season is in.
+def load_historical_data():
+    with ThreadPoolExecutor(max_workers=len(historical_seasons)) as pool:
+        futures = [pool.submit(load_season, season_code) for season_code, _ in historical_seasons]
+
+    all_matches = []
+    loaded = []
+    for (season_code, season_name), future in zip(historical_seasons, futures):
+        try:
+            data = future.result()
+        except Exception as e:
+            print(f"Error loading historical data for {season_code}: {e}")
+            continue
+        if data:
+            loaded.append(season_name)
+            for match in data.get('matches', []):
+                if 'score' in match and 'ft' in match['score']:
+                    all_matches.append({
+                        'date': match['date'],
+                        'season': season_name,
+                        'team1': match['team1'],
+                        'team2': match['team2'],
+                        'score': {'ft': match['score']['ft']}
+                    })
+
+    return all_matches, tuple(loaded)
 
-# Find head-to-head matches between two teams
-def find_head_to_head_matches(team1_name, team2_name, historical_matches):
+# Head-to-head index over the historical matches, built once per history load.
+# Every distinct openfootball team name gets a canonical id and meetings are stored
+# per unordered id pair, most recent first, so a lookup never scans the season.
+# seasons lists the seasons it covers; complete is False while any is missing.
+class HeadToHeadIndex:
+    def __init__(self, historical_matches, seasons=()):
+        self.seasons = seasons
+        self.complete = len(seasons) == len(historical_seasons)
+        self.team_ids = {}
+        self.pairs = {}
+        self.resolved = {}
+        for seq, match in enumerate(historical_matches):
+            home_id = self.team_ids.setdefault(normalize(match['team1']), len(self.team_ids))
+            away_id = self.team_ids.setdefault(normalize(match['team2']), len(self.team_ids))
+            self.pairs.setdefault(frozenset((home_id, away_id)), []).append((seq, home_id, match))
+        for meetings in self.pairs.values():
+            meetings.sort(key=lambda m: m[2]['date'], reverse=True)
+
+    # Canonical ids of every team whose normalized name contains the given one
+    # ("fulham" -> "fulham fc")
+    def resolve(self, name_norm):
+        ids = self.resolved.get(name_norm)
+        if ids is None:
+            ids = frozenset(tid for team, tid in self.team_ids.items() if name_norm in team)
+            self.resolved[name_norm] = ids
+        return ids
+
+    def meetings(self, team1_norm, team2_norm):
+        team1_ids = self.resolve(team1_norm)
+        team2_ids = self.resolve(team2_norm)
+        keys = {frozenset((a, b)) for a in team1_ids for b in team2_ids if a != b}
+        if len(keys) == 1:
+            return team1_ids, self.pairs.get(keys.pop(), [])
+        # Rare: a name matched several teams, merge the lists back into history order
+        merged = sorted((m for key in keys for m in self.pairs.get(key, [])), key=lambda m: m[0])
+        merged.sort(key=lambda m: m[2]['date'], reverse=True)
+        return team1_ids, merged
+
+# Historical matches are held in memory for the life of the worker, already indexed.
+# Only a complete load is kept; after a partial or failed one (network or disk) the
+# index is served uncached and the next call retries the missing seasons, while the
+# seasons that did load come from the on-disk cache.
+h2h_index_cache = None
+
+# Served while history is unavailable, so head-to-head degrades to "no data"
+EMPTY_H2H_INDEX = HeadToHeadIndex([])
+
+def load_h2h_index():
+    global h2h_index_cache
+    if h2h_index_cache is None:
+        matches, seasons = load_historical_data()
+        if not matches:
+            return EMPTY_H2H_INDEX
+        h2h_index = HeadToHeadIndex(matches, seasons)
+        if not h2h_index.complete:
+            return h2h_index
+        h2h_index_cache = h2h_index
+    return h2h_index_cache
+
+def get_h2h_index():
+    if h2h_index_cache is None:
+        return single_flight.do('history', load_h2h_index)
+    return h2h_index_cache
+
+# History for the snapshot after one built on previous_index: kept once complete,
+# retried otherwise. A retry that loaded no new season returns previous_index, so an
+# unchanged snapshot is not rebuilt.
+def next_h2h_index(previous_index):
+    if previous_index.complete:
+        return previous_index
+    h2h_index = get_h2h_index()
+    return previous_index if h2h_index.seasons == previous_index.seasons else h2h_index
+
+# Find the last 4 head-to-head matches between two teams (TeamEntry rows)
+def find_head_to_head_matches(team1, team2, h2h_index):
+    team1_name = team1.of_name
+    team2_name = team2.of_name
+    team1_ids, meetings = h2h_index.meetings(team1.of_norm, team2.of_norm)
     matches = []
-    
-    # Normalize team names for comparison
-    team1_norm = normalize(team1_name)
-    team2_norm = normalize(team2_name)
-    
-    for match in historical_matches:
-        team1_match = normalize(match['team1'])
-        team2_match = normalize(match['team2'])
-        
-        # Check if this match involves both teams
-        if (team1_norm in team1_match and team2_norm in team2_match) or \
-           (team1_norm in team2_match and team2_norm in team1_match):
-            
-            # Determine which team is which
-            if team1_norm in team1_match:
-                home_team = team1_name
-                away_team = team2_name
-                home_score = match['score']['ft'][0]
-                away_score = match['score']['ft'][1]
-            else:
-                home_team = team2_name
-                away_team = team1_name
-                home_score = match['score']['ft'][1]
-                away_score = match['score']['ft'][0]
-            
-            matches.append({
-                'date': match['date'],
-                'season': match['season'],
-                'home_team': home_team,
-                'away_team': away_team,
-                'home_score': home_score,
-                'away_score': away_score
-            })
-    
-    # Sort by date (most recent first) and take last 4
-    matches.sort(key=lambda x: x['date'], reverse=True)
-    return matches[:4]
+    for _, home_id, match in meetings[:4]:
+        # Report the score from team1's side when it was the home team
+        if home_id in team1_ids:
+            home_team = team1_name
+            away_team = team2_name
+            home_score = match['score']['ft'][0]
+            away_score = match['score']['ft'][1]
+        else:
+            home_team = team2_name
+            away_team = team1_name
+            home_score = match['score']['ft'][1]
+            away_score = match['score']['ft'][0]
+
+        matches.append({
+            'date': match['date'],
+            'season': match['season'],
+            'home_team': home_team,
+            'away_team': away_team,
+            'home_score': home_score,
+            'away_score': away_score
+        })
+    return matches
 
 # Generate head-to-head summary
 def generate_h2h_summary(matches, player_team):
@@ -186,33 +603,691 @@ def format_h2h_data(matches, player_team):
         "matches": formatted_matches
     }
 
-# Load all FPL data with timeout and error handling
-def load_fpl_data():
+# Columnar store for the ~700 bootstrap-static elements: one typed array per numeric
+# field and one list of interned strings per text field, addressed by row number.
+# Only the fields the app reads are kept; numeric columns may also be memoryviews
+# over a shared snapshot file, in which case they are never copied into the process.
+PLAYER_NUMERIC_COLUMNS = (
+    ('id', 'i'),
+    ('team', 'i'),
+    ('now_cost', 'i'),
+    ('points_per_game', 'd'),
+    ('selected_by_percent', 'd')
+)
+PLAYER_STRING_COLUMNS = ('first_name', 'second_name', 'web_name', 'status')
+
+class PlayerStore:
+    def __init__(self, numeric, strings):
+        self.numeric = numeric
+        self.strings = strings
+        self.id = numeric['id']
+        self.team = numeric['team']
+        self.now_cost = numeric['now_cost']
+        self.points_per_game = numeric['points_per_game']
+        self.selected_by_percent = numeric['selected_by_percent']
+        self.first_name = strings['first_name']
+        self.second_name = strings['second_name']
+        self.web_name = strings['web_name']
+        self.status = strings['status']
+        self.rows = {player_id: row for row, player_id in enumerate(self.id)}
+
+    @classmethod
+    def from_elements(cls, elements):
+        numeric = {
+            name: array(typecode, (float(e.get(name) or 0) if typecode == 'd' else int(e.get(name) or 0) for e in elements))
+            for name, typecode in PLAYER_NUMERIC_COLUMNS
+        }
+        strings = {
+            name: [sys.intern(e.get(name) or '') for e in elements]
+            for name in PLAYER_STRING_COLUMNS
+        }
+        return cls(numeric, strings)
+
+    def __len__(self):
+        return len(self.id)
+
+    # Row of the player with this FPL element id, or None
+    def row_for_id(self, player_id):
+        return self.rows.get(player_id)
+
+# The only fields read from the other upstream records. Payloads are projected down
+# to these on load, so a snapshot never holds the raw bootstrap-static payload.
+TEAM_FIELDS = ('id', 'name', 'short_name')
+EVENT_FIELDS = ('id', 'deadline_time')
+FIXTURE_FIELDS = ('id', 'event', 'team_h', 'team_a', 'team_h_difficulty', 'team_a_difficulty',
+                  'kickoff_time', 'finished')
+
+SOURCE_FIELDS = {
+    'teams': TEAM_FIELDS,
+    'events': EVENT_FIELDS,
+    'fixtures': FIXTURE_FIELDS
+}
+
+def project(records, fields):
+    return [{field: record.get(field) for field in fields} for record in records]
+
+# Returned by load_fpl_data when a conditional refresh found nothing new
+NOT_MODIFIED = object()
+
+# Load all FPL data with timeout and error handling. Returns the projected sources
+# ({'players': PlayerStore, 'teams', 'events', 'fixtures', 'validators'}) or None on
+# failure; 'validators' holds each payload's upstream validators by URL. With previous
+# (the sources of the last snapshot) the requests are conditional on its validators:
+# NOT_MODIFIED means neither payload has changed, and when only one has, the projected
+# half of the other is reused from previous. Nothing is remembered from a failed load,
+# so whatever it fetched is fetched again next time.
+def load_fpl_data(previous=None):
+    known = previous['validators'] if previous is not None else {}
     try:
-        # Add timeout to prevent hanging
-        static = requests.get("https://fantasy.premierleague.com/api/bootstrap-static/", timeout=10).json()
-        fixtures = requests.get("https://fantasy.premierleague.com/api/fixtures/", timeout=10).json()
-        return static['elements'], static['teams'], fixtures
+        (static, static_validators), (fixtures, fixtures_validators) = run_concurrently(
+            lambda: upstream.get_json(FPL_BOOTSTRAP_URL, known.get(FPL_BOOTSTRAP_URL)),
+            lambda: upstream.get_json(FPL_FIXTURES_URL, known.get(FPL_FIXTURES_URL))
+        )
+        static_changed = static is not None
+        fixtures_changed = fixtures is not None
+        if not static_changed and not fixtures_changed:
+            return NOT_MODIFIED
+        if static_changed:
+            if not static['elements']:
+                return None
+            sources = {
+                'players': PlayerStore.from_elements(static['elements']),
+                'teams': project(static['teams'], TEAM_FIELDS),
+                'events': project(static.get('events', []), EVENT_FIELDS)
+            }
+        else:
+            sources = {name: previous[name] for name in ('players', 'teams', 'events')}
+        sources['fixtures'] = project(fixtures, FIXTURE_FIELDS) if fixtures_changed else previous['fixtures']
+        sources['validators'] = {FPL_BOOTSTRAP_URL: static_validators, FPL_FIXTURES_URL: fixtures_validators}
+        return sources
     except Exception as e:
         print(f"Error loading FPL data: {e}")
-        return [], [], []
+        return None
 
-# Match player
-def match_player(name, players):
-    name_clean = normalize(name)
-    player_map = {}
-    for p in players:
-        web = normalize(p['web_name'])
-        full = normalize(f"{p['first_name']} {p['second_name']}")
-        last = normalize(p['second_name'])
-        for variant in [web, full, last]:
-            player_map[variant] = p
+# How long a bootstrap-static/fixtures snapshot is served before refetching when
+# nothing is happening (seconds); RefreshScheduler shortens it around busy periods
+FPL_CACHE_TTL = float(os.environ.get('FPL_CACHE_TTL', 1800))
+
+# Past the TTL the last good snapshot keeps being served while it refreshes in the
+# background; past this age requests block on the refresh again (seconds)
+FPL_CACHE_MAX_STALENESS = float(os.environ.get('FPL_CACHE_MAX_STALENESS', 3600))
+
+# Minimum gap between background refreshes after one has failed (seconds)
+FAILED_REFRESH_BACKOFF = 30
+
+# Process-wide cache around a loader with stale-while-revalidate. The published
+# entry is an immutable (value, loaded_at, ttl) tuple replaced with one assignment,
+# so readers never take a lock and never see a half-built value.
+# loader(previous) returns (value, confirmed_at): a new value, previous itself when
+# nothing changed (which renews it), or None on failure, with the wall-clock time its
+# data was last confirmed against upstream, from which its age is counted.
+# ttl_for(value, confirmed_at) says how long after that the value stays fresh, and
+# superseded(value) lets a newer value published elsewhere cut that short.
+# Blocking misses go through single_flight so concurrent callers share one refresh.
+# Counters are updated without locking and are approximate under contention.
+class SnapshotCache:
+    def __init__(self, name, loader, ttl_for, max_staleness, superseded=None):
+        self.name = name
+        self.loader = loader
+        self.ttl_for = ttl_for
+        self.max_staleness = max_staleness
+        self.superseded = superseded or (lambda value: False)
+        self.entry = (None, 0.0, 0.0)
+        # Held while a background refresh runs; readers only ever try it, never wait
+        self.refresh_gate = threading.Lock()
+        self.failed_at = float('-inf')
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.background_refreshes = 0
+        self.not_modified = 0
+        self.failures = 0
+
+    @property
+    def value(self):
+        return self.entry[0]
+
+    # Returns (value, age in seconds); value is None only if nothing could be loaded
+    def get(self):
+        value, loaded_at, ttl = self.entry
+        if value is not None:
+            age = time.monotonic() - loaded_at
+            if age < ttl and not self.superseded(value):
+                self.hits += 1
+                return value, age
+            if age < max(ttl, self.max_staleness):
+                self.stale_hits += 1
+                self.refresh_in_background()
+                return value, age
+        self.misses += 1
+        return single_flight.do(self.name, self.refresh)
+
+    def refresh(self):
+        previous = self.entry[0]
+        value, confirmed_at = self.loader(previous)
+        # A failed load never replaces a good value
+        if value is None:
+            self.failures += 1
+            self.failed_at = time.monotonic()
+        else:
+            if value is previous:
+                self.not_modified += 1
+            age = max(0.0, time.time() - confirmed_at)
+            self.entry = (value, time.monotonic() - age, max(1.0, self.ttl_for(value, confirmed_at)))
+        value, loaded_at, _ = self.entry
+        return value, (time.monotonic() - loaded_at if value is not None else 0.0)
+
+    def refresh_in_background(self):
+        if time.monotonic() - self.failed_at < FAILED_REFRESH_BACKOFF:
+            return
+        if not self.refresh_gate.acquire(blocking=False):
+            return
+        self.background_refreshes += 1
+        threading.Thread(target=self.background_refresh, name=f"{self.name}-refresh", daemon=True).start()
+
+    def background_refresh(self):
+        try:
+            single_flight.do(self.name, self.refresh)
+        except Exception as e:
+            print(f"Background refresh of {self.name} failed: {e}")
+            self.failures += 1
+            self.failed_at = time.monotonic()
+        finally:
+            self.refresh_gate.release()
+
+    def stats(self):
+        value, loaded_at, ttl = self.entry
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "version": value.version if value is not None else None,
+            "ttl": ttl,
+            "max_staleness": self.max_staleness,
+            "age": round(time.monotonic() - loaded_at, 3) if value is not None else None,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+            "background_refreshes": self.background_refreshes,
+            "not_modified": self.not_modified,
+            "refreshing": self.refresh_gate.locked(),
+            "failures": self.failures
+        }
+
+# Refresh intervals (seconds) while a match is live, around a gameweek deadline and
+# around the nightly price change; outside those windows FPL_CACHE_TTL applies
+REFRESH_LIVE = float(os.environ.get('REFRESH_LIVE', 60))
+REFRESH_DEADLINE = float(os.environ.get('REFRESH_DEADLINE', 120))
+REFRESH_PRICE_CHANGE = float(os.environ.get('REFRESH_PRICE_CHANGE', 120))
+
+# Busy windows as (seconds before, seconds after) the event they are anchored on
+MATCH_WINDOW = (0, 150 * 60)              # kickoff until bonus points settle
+DEADLINE_WINDOW = (60 * 60, 30 * 60)      # the hour before a deadline, and just after
+PRICE_CHANGE_WINDOW = (5 * 60, 25 * 60)   # prices change at about 01:30 UK time
+
+PRICE_CHANGE_TIME = dtime(1, 30)
+UK_TIMEZONE = ZoneInfo('Europe/London')
+
+# ISO-8601 timestamp from FPL ("2024-08-16T17:30:00Z") to epoch seconds
+def parse_fpl_time(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+def format_fpl_time(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+# Current time in FPL's kickoff_time format, which sorts chronologically as a string
+def fpl_now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+# Plans refreshes from the gameweek deadlines in bootstrap-static's events and the
+# fixture kickoff times: short intervals while something is changing, FPL_CACHE_TTL
+# otherwise, and never sleeping through the start of the next busy window.
+class RefreshScheduler:
+    def __init__(self, events, fixtures, idle=FPL_CACHE_TTL):
+        self.idle = idle
+        windows = []
+        for f in fixtures:
+            if f.get('kickoff_time'):
+                kickoff = parse_fpl_time(f['kickoff_time'])
+                windows.append((kickoff - MATCH_WINDOW[0], kickoff + MATCH_WINDOW[1], REFRESH_LIVE, "match"))
+        for e in events:
+            if e.get('deadline_time'):
+                deadline = parse_fpl_time(e['deadline_time'])
+                windows.append((deadline - DEADLINE_WINDOW[0], deadline + DEADLINE_WINDOW[1], REFRESH_DEADLINE, "deadline"))
+        windows.sort()
+        self.windows = windows
+        self.starts = [w[0] for w in windows]
+        self.longest = max((w[1] - w[0] for w in windows), default=0)
+
+    # Daily price change windows from yesterday onwards, in UK local time
+    def price_change_windows(self, now, days):
+        today = datetime.fromtimestamp(now, UK_TIMEZONE).date()
+        for offset in range(-1, days + 1):
+            at = datetime.combine(today + timedelta(days=offset), PRICE_CHANGE_TIME, tzinfo=UK_TIMEZONE).timestamp()
+            yield (at - PRICE_CHANGE_WINDOW[0], at + PRICE_CHANGE_WINDOW[1], REFRESH_PRICE_CHANGE, "price_change")
+
+    # Windows that overlap [now, now + horizon]
+    def windows_between(self, now, horizon):
+        lo = bisect_left(self.starts, now - self.longest)
+        hi = bisect_right(self.starts, now + horizon)
+        nearby = [w for w in self.windows[lo:hi] if w[1] > now]
+        nearby.extend(w for w in self.price_change_windows(now, int(horizon // 86400) + 1) if w[1] > now and w[0] <= now + horizon)
+        return nearby
+
+    # (epoch seconds, reason) of the next refresh after now
+    def next_refresh(self, now):
+        nearby = self.windows_between(now, self.idle)
+        interval, reason = self.idle, "idle"
+        for start, end, window_interval, window_reason in nearby:
+            if start <= now and window_interval < interval:
+                interval, reason = window_interval, window_reason
+        at = now + interval
+        for start, end, window_interval, window_reason in nearby:
+            if now < start <= at:
+                at, reason = start, window_reason
+        return at, reason
+
+    # Planned refresh times and upcoming busy windows, for /stats
+    def describe(self, now, count=5):
+        planned = []
+        at = now
+        for _ in range(count):
+            at, reason = self.next_refresh(at)
+            planned.append({"at": format_fpl_time(at), "reason": reason})
+        upcoming = sorted(w for w in self.windows_between(now, 7 * 86400) if w[0] > now)[:count]
+        return {
+            "next_refreshes": planned,
+            "upcoming_windows": [
+                {"start": format_fpl_time(start), "end": format_fpl_time(end), "interval": interval, "reason": reason}
+                for start, end, interval, reason in upcoming
+            ]
+        }
+
+snapshot_versions = itertools.count(1)
+
+# Immutable bundle of the projected FPL sources, history and every index derived
+# from them. A refresh builds a complete new Snapshot and publishes it by swapping a
+# single reference, so a request sees either the old snapshot or the new one.
+class Snapshot:
+    __slots__ = ('version', 'built_at', 'fingerprint', 'sources', 'players', 'teams', 'fixtures', 'names',
+                 'schedule', 'h2h', 'fragments')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
 
-    if name_clean in player_map:
-        return player_map[name_clean], None
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot is immutable")
 
-    close = get_close_matches(name_clean, list(player_map.keys()), n=1, cutoff=0.6)
-    return (None, close[0]) if close else (None, None)
+# Digest of the projected sources. Version numbers are local to a process (or to a
+# machine with a shared snapshot); the fingerprint is the same wherever the same data
+# was loaded, so it can go into validators that clients replay against any dyno.
+def fingerprint_sources(sources):
+    digest = hashlib.blake2b(digest_size=8)
+    players = sources['players']
+    for name, _ in PLAYER_NUMERIC_COLUMNS:
+        digest.update(memoryview(players.numeric[name]).cast('B'))
+    for name in PLAYER_STRING_COLUMNS:
+        digest.update('\0'.join(players.strings[name]).encode())
+    for name, fields in SOURCE_FIELDS.items():
+        digest.update(repr([tuple(record[field] for field in fields) for record in sources[name]]).encode())
+    return digest.hexdigest()
+
+# Every snapshot is built warm: head-to-head team lookups resolved and each team's
+# fixtures block rendered before it is published, whichever path loaded it
+def build_snapshot(sources, h2h_index, version, built_at=None):
+    teams = TeamTable(sources['teams'])
+    fixtures = FixtureIndex(sources['fixtures'])
+    snapshot = Snapshot(
+        version=version,
+        built_at=built_at or time.time(),
+        fingerprint=fingerprint_sources(sources),
+        sources=sources,
+        players=sources['players'],
+        teams=teams,
+        fixtures=fixtures,
+        names=PlayerNameIndex(sources['players']),
+        schedule=RefreshScheduler(sources['events'], sources['fixtures']),
+        h2h=h2h_index,
+        fragments=FixtureFragments(fixtures, teams, h2h_index)
+    )
+    now = fpl_now()
+    for team in teams.entries:
+        if team:
+            h2h_index.resolve(team.of_norm)
+            snapshot.fragments.get(team.id, now)
+    return snapshot
+
+# Fetch from upstream and build the next snapshot, numbered by next_version(). A cold
+# load fetches the FPL payloads and history side by side. When upstream reports that
+# nothing changed, the previous snapshot is returned as-is unless more history has
+# just become available.
+def fetch_fpl_snapshot(previous, next_version):
+    if previous is None:
+        sources, h2h_index = run_concurrently(load_fpl_data, get_h2h_index)
+    else:
+        sources = load_fpl_data(previous.sources)
+        # History never changes once complete; only retry it while seasons are missing
+        h2h_index = next_h2h_index(previous.h2h)
+
+    if sources is None:
+        return None
+    if sources is NOT_MODIFIED:
+        if h2h_index is previous.h2h:
+            return previous
+        sources = previous.sources
+    return build_snapshot(sources, h2h_index, next_version())
+
+# Directory for the snapshot shared by all workers on this machine; unset to disable
+SHARED_SNAPSHOT_DIR = os.environ.get('SHARED_SNAPSHOT_DIR', '')
+
+# Shared snapshot file layout: a header (magic, generation, built_at, body offset,
+# body length), the raw bytes of each numeric player column at 8-byte aligned
+# offsets, then a marshal-encoded body holding the column directory, the player
+# string columns, the upstream validators and the other sources with every record
+# stored as a tuple in *_FIELDS order. Numeric columns are read in place through the
+# mapping.
+SHARED_SNAPSHOT_MAGIC = b'FPLSNAP3'
+SHARED_SNAPSHOT_HEADER = struct.Struct('<8sQdQQ')
+
+# Generation file: generation of the current snapshot file and when its data was last
+# confirmed against upstream. Every worker maps it read-only, so noticing a new
+# generation costs a memory read rather than a syscall.
+SHARED_GENERATION = struct.Struct('<Qd')
+
+# One worker per machine refreshes from upstream (elected with flock) and writes the
+# snapshot once to a compact file; the others map that file and rebuild their
+# indexes from it instead of fetching and parsing the full payloads themselves.
+class SharedSnapshotStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.data_path = os.path.join(directory, 'snapshot.bin')
+        self.generation_path = os.path.join(directory, 'snapshot.gen')
+        self.lock_path = os.path.join(directory, 'refresh.lock')
+        self.open_lock = threading.Lock()
+        self.pid = None
+        self.generation_fd = None
+        self.generation_map = None
+
+    # Opened lazily, and again in a forked child, so every process has its own mapping
+    def ensure_open(self):
+        if self.pid == os.getpid():
+            return
+        with self.open_lock:
+            if self.pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            fd = os.open(self.generation_path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size < SHARED_GENERATION.size:
+                os.ftruncate(fd, SHARED_GENERATION.size)
+            self.generation_fd = fd
+            self.generation_map = mmap.mmap(fd, SHARED_GENERATION.size, access=mmap.ACCESS_READ)
+            self.pid = os.getpid()
+
+    # (generation, confirmed_at); generation 0 means nothing has been published yet
+    def generation(self):
+        self.ensure_open()
+        return SHARED_GENERATION.unpack_from(self.generation_map, 0)
+
+    @contextmanager
+    def refresh_lock(self):
+        self.ensure_open()
+        with open(self.lock_path, 'a') as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # Only called while holding refresh_lock
+    def next_generation(self):
+        return self.generation()[0] + 1
+
+    def publish(self, snapshot):
+        players = snapshot.sources['players']
+        columns = {}
+        chunks = []
+        offset = SHARED_SNAPSHOT_HEADER.size
+        for name, typecode in PLAYER_NUMERIC_COLUMNS:
+            offset += -offset % 8
+            data = array(typecode, players.numeric[name]).tobytes()
+            columns[name] = (typecode, offset, len(data))
+            chunks.append((offset, data))
+            offset += len(data)
+        body = marshal.dumps({
+            'columns': columns,
+            'strings': players.strings,
+            'validators': snapshot.sources['validators'],
+            **{
+                name: [tuple(record[field] for field in fields) for record in snapshot.sources[name]]
+                for name, fields in SOURCE_FIELDS.items()
+            }
+        })
+        header = SHARED_SNAPSHOT_HEADER.pack(SHARED_SNAPSHOT_MAGIC, snapshot.version, snapshot.built_at, offset, len(body))
+        tmp_path = f"{self.data_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            fh.write(header)
+            for chunk_offset, data in chunks:
+                fh.seek(chunk_offset)
+                fh.write(data)
+            fh.seek(offset)
+            fh.write(body)
+        os.replace(tmp_path, self.data_path)
+        os.pwrite(self.generation_fd, SHARED_GENERATION.pack(snapshot.version, time.time()), 0)
+
+    # Record that upstream still matches the current generation
+    def confirm(self):
+        generation, _ = self.generation()
+        os.pwrite(self.generation_fd, SHARED_GENERATION.pack(generation, time.time()), 0)
+
+    # Snapshot for the current generation, or None if the file is missing or replaced
+    # mid-read. The mapping stays open for as long as the snapshot's player columns
+    # point into it; the kernel unmaps it once the snapshot is dropped.
+    def read(self, h2h_index):
+        try:
+            with open(self.data_path, 'rb') as fh:
+                mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, generation, built_at, body_offset, body_length = SHARED_SNAPSHOT_HEADER.unpack_from(mapped, 0)
+            if magic != SHARED_SNAPSHOT_MAGIC:
+                return None
+            body = marshal.loads(mapped[body_offset:body_offset + body_length])
+        except (OSError, ValueError, EOFError, struct.error) as e:
+            print(f"Unable to read shared snapshot: {e}")
+            return None
+        view = memoryview(mapped)
+        numeric = {
+            name: view[offset:offset + length].cast(typecode)
+            for name, (typecode, offset, length) in body['columns'].items()
+        }
+        strings = {name: [sys.intern(value) for value in values] for name, values in body['strings'].items()}
+        sources = {
+            name: [dict(zip(fields, row)) for row in body[name]]
+            for name, fields in SOURCE_FIELDS.items()
+        }
+        sources['players'] = PlayerStore(numeric, strings)
+        sources['validators'] = body['validators']
+        return build_snapshot(sources, h2h_index, generation, built_at)
+
+    # (snapshot, confirmed_at) for a snapshot another worker has published (or
+    # confirmed) recently enough to use without going upstream, or None. History is
+    # loaded per process, so it is retried here while this worker has none.
+    def load(self, previous):
+        generation, confirmed_at = self.generation()
+        if generation == 0:
+            return None
+        h2h_index = next_h2h_index(previous.h2h) if previous is not None else get_h2h_index()
+        if previous is not None and previous.version == generation:
+            current = previous
+            if h2h_index is not previous.h2h:
+                current = build_snapshot(previous.sources, h2h_index, generation, previous.built_at)
+        else:
+            current = self.read(h2h_index)
+            if current is None:
+                return None
+        if time.time() < current.schedule.next_refresh(confirmed_at)[0]:
+            return current, confirmed_at
+        return None
+
+    def superseded(self, snapshot):
+        generation, _ = self.generation()
+        return generation != 0 and generation != snapshot.version
+
+shared_store = SharedSnapshotStore(SHARED_SNAPSHOT_DIR) if SHARED_SNAPSHOT_DIR and fcntl else None
+
+# Load the next snapshot, as (snapshot, confirmed_at). With a shared store, a snapshot
+# another worker has already published is used as-is, dated from when it was last
+# confirmed; otherwise this worker takes the refresh lock, fetches, and publishes the
+# result for everyone else.
+def load_fpl_snapshot(previous):
+    if shared_store is None:
+        return fetch_fpl_snapshot(previous, lambda: next(snapshot_versions)), time.time()
+
+    loaded = shared_store.load(previous)
+    if loaded is not None:
+        return loaded
+    with shared_store.refresh_lock():
+        # Another worker may have refreshed while we waited for the lock
+        loaded = shared_store.load(previous)
+        if loaded is not None:
+            return loaded
+        snapshot = fetch_fpl_snapshot(previous, shared_store.next_generation)
+        if snapshot is previous:
+            shared_store.confirm()
+        elif snapshot is not None:
+            shared_store.publish(snapshot)
+        return snapshot, time.time()
+
+# A snapshot is superseded once another worker publishes a newer generation
+def fpl_superseded(snapshot):
+    return shared_store is not None and shared_store.superseded(snapshot)
+
+# Seconds after confirmed_at until the scheduler wants a snapshot refreshed
+def fpl_refresh_interval(snapshot, confirmed_at):
+    return snapshot.schedule.next_refresh(confirmed_at)[0] - confirmed_at
+
+fpl_cache = SnapshotCache('fpl', load_fpl_snapshot, fpl_refresh_interval, FPL_CACHE_MAX_STALENESS, fpl_superseded)
+
+# Normalized name variants for every player, built once per bootstrap snapshot.
+# Each variant maps to a bucket of (kind, row) so players sharing a surname are
+# all kept; buckets are ordered best match first: full name, then web name, then
+# surname, with the most selected player winning a tie.
+NAME_FULL, NAME_WEB, NAME_SURNAME = 0, 1, 2
+
+class PlayerNameIndex:
+    def __init__(self, players):
+        buckets = {}
+        for row in range(len(players)):
+            first_name = players.first_name[row]
+            second_name = players.second_name[row]
+            variants = (
+                (NAME_FULL, normalize(f"{first_name} {second_name}")),
+                (NAME_WEB, normalize(players.web_name[row])),
+                (NAME_SURNAME, normalize(second_name))
+            )
+            for kind, variant in variants:
+                bucket = buckets.setdefault(variant, [])
+                # web name and surname are often identical; keep the better kind only
+                if not bucket or bucket[-1][1] != row:
+                    bucket.append((kind, row))
+        selected = players.selected_by_percent
+        for bucket in buckets.values():
+            bucket.sort(key=lambda entry: (entry[0], -selected[entry[1]]))
+        self.buckets = buckets
+        self.variants = list(buckets)
+        self.fuzzy = FuzzyMatcher(self.variants)
+        # Every (variant, row) pair sorted by variant, so the variants starting with a
+        # prefix form one contiguous range found by bisection
+        pairs = sorted((variant, row) for variant, bucket in buckets.items() for _, row in bucket)
+        self.prefix_keys = [variant for variant, _ in pairs]
+        self.prefix_rows = array('i', (row for _, row in pairs))
+        self.selected = selected
+
+    def lookup(self, name_clean):
+        return self.buckets.get(name_clean, [])
+
+    # Rows of the k most selected players with a name variant starting with prefix
+    def complete(self, prefix, k=10):
+        lo = bisect_left(self.prefix_keys, prefix)
+        hi = bisect_left(self.prefix_keys, prefix + '\uffff', lo)
+        selected = self.selected
+        return heapq.nlargest(k, set(self.prefix_rows[lo:hi]), key=lambda row: (selected[row], -row))
+
+# Fuzzy search over name variants using a character trigram inverted index.
+# Grams shared with the query pick a small candidate set (ranked by Dice overlap)
+# that usually holds the best matches, so the k-th best score found there becomes a
+# floor that rules out most other variants on length alone. The rest are checked with
+# difflib's cheap upper bounds before any full ratio, so results are exactly those
+# of get_close_matches without running SequenceMatcher against every variant.
+class FuzzyMatcher:
+    def __init__(self, variants, n=3, candidates=50):
+        self.variants = variants
+        self.n = n
+        self.candidates = candidates
+        # Variant indexes ordered by length, to visit only the lengths that can still
+        # reach a given ratio
+        self.by_length = sorted(range(len(variants)), key=lambda i: len(variants[i]))
+        self.lengths = [len(variants[i]) for i in self.by_length]
+        self.gram_counts = []
+        self.postings = {}
+        for i, variant in enumerate(variants):
+            grams = self.grams(variant)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    # Distinct n-grams of the text, padded so word starts and ends count too
+    def grams(self, text):
+        padded = ' ' * (self.n - 1) + text + ' '
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    # Top k (variant, score) pairs with a difflib ratio of at least cutoff, best first
+    def search(self, query, k=5, cutoff=0.6):
+        query_grams = self.grams(query)
+        shared = Counter()
+        for gram in query_grams:
+            for i in self.postings.get(gram, ()):
+                shared[i] += 1
+        overlap = lambda i: 2 * shared[i] / (len(query_grams) + self.gram_counts[i])
+        pool = heapq.nlargest(self.candidates, shared, key=overlap)
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        # Min-heap of the best k (score, variant) pairs so far; its head is the floor
+        # any further variant has to reach
+        best = []
+        def consider(i, floor):
+            matcher.set_seq1(self.variants[i])
+            if matcher.real_quick_ratio() >= floor and matcher.quick_ratio() >= floor:
+                score = matcher.ratio()
+                if score >= floor:
+                    entry = (score, self.variants[i])
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+
+        for i in pool:
+            consider(i, cutoff)
+        pooled = set(pool)
+        query_length = len(query)
+        floor = best[0][0] if len(best) == k else cutoff
+        # Lengths whose real_quick_ratio (2 * shorter / total) can reach the floor
+        lo = bisect_left(self.lengths, floor * query_length / (2 - floor) - 1e-9)
+        hi = bisect_right(self.lengths, query_length * (2 - floor) / floor + 1e-9)
+        for position in range(lo, hi):
+            i = self.by_length[position]
+            if i not in pooled:
+                consider(i, best[0][0] if len(best) == k else cutoff)
+        return [(variant, round(score, 4)) for score, variant in sorted(best, reverse=True)]
+
+# Match player; returns (row in the PlayerStore or None, suggestion or None)
+def match_player(name, name_index):
+    name_clean = normalize(name)
+    bucket = name_index.lookup(name_clean)
+    if bucket:
+        return bucket[0][1], None
+
+    close = name_index.fuzzy.search(name_clean, k=1, cutoff=0.6)
+    return (None, close[0][0]) if close else (None, None)
 
 # Team name mapping for FPL to openfootball
 team_name_mapping = {
@@ -239,56 +1314,94 @@ team_name_mapping = {
     "Bournemouth": "AFC Bournemouth"
 }
 
-# Get team name
-def get_team_name(team_id, teams):
-    for t in teams:
-        if t['id'] == team_id:
-            return t['name']
-    return "Unknown"
-
 # Map FPL team name to openfootball format
 def map_team_name(fpl_name):
     return team_name_mapping.get(fpl_name, fpl_name)
 
+# Team names resolved once per snapshot: FPL name, short name, openfootball name
+# and its normalized form (used for head-to-head lookups)
+TeamEntry = namedtuple('TeamEntry', ['id', 'name', 'short_name', 'of_name', 'of_norm'])
+
+UNKNOWN_TEAM = TeamEntry(0, "Unknown", "", "Unknown", "unknown")
+
+# Dense array of TeamEntry rows indexed by FPL team id
+class TeamTable:
+    def __init__(self, teams):
+        self.entries = [None] * (max((t['id'] for t in teams), default=0) + 1)
+        for t in teams:
+            of_name = map_team_name(t['name'])
+            self.entries[t['id']] = TeamEntry(t['id'], t['name'], t.get('short_name', ''), of_name, normalize(of_name))
+
+    def get(self, team_id):
+        if 0 <= team_id < len(self.entries):
+            return self.entries[team_id] or UNKNOWN_TEAM
+        return UNKNOWN_TEAM
+
+# Number of upcoming fixtures reported per player
+NEXT_FIXTURES = 4
+
+# Unfinished fixtures indexed by team, each list ordered by kickoff time.
+# Built once per fixtures snapshot; fixtures without a kickoff time are left out.
+class FixtureIndex:
+    def __init__(self, fixtures):
+        by_team = {}
+        scheduled = [f for f in fixtures if not f.get('finished') and f.get('kickoff_time')]
+        scheduled.sort(key=lambda f: f['kickoff_time'])
+        for f in scheduled:
+            for team_id in (f['team_h'], f['team_a']):
+                kickoffs, team_fixtures = by_team.setdefault(team_id, ([], []))
+                kickoffs.append(f['kickoff_time'])
+                team_fixtures.append(f)
+        self.by_team = by_team
+        self.kickoffs = [f['kickoff_time'] for f in scheduled]
+
+    # Number of indexed fixtures that have kicked off by now. Every team's upcoming
+    # fixtures stay the same for as long as this does.
+    def epoch(self, now=None):
+        return bisect_left(self.kickoffs, now or fpl_now())
+
+    # Index of the team's first fixture kicking off at or after now (ISO-8601 UTC, as
+    # FPL reports it)
+    def position(self, team_id, now=None):
+        if team_id not in self.by_team:
+            return 0
+        return bisect_left(self.by_team[team_id][0], now or fpl_now())
+
+    # Next n fixtures kicking off at or after now
+    def upcoming(self, team_id, n=NEXT_FIXTURES, now=None):
+        if team_id not in self.by_team:
+            return []
+        start = self.position(team_id, now)
+        return self.by_team[team_id][1][start:start + n]
+
 # Get next 4 fixtures with head-to-head data
-def get_next_fixtures(team_id, fixtures, teams, historical_matches):
+def get_next_fixtures(team_id, fixture_index, team_table, h2h_index, now=None):
+    team = team_table.get(team_id)
     upcoming = []
-    for f in fixtures:
-        if f['team_h'] == team_id or f['team_a'] == team_id:
-            is_home = f['team_h'] == team_id
-            opp_id = f['team_a'] if is_home else f['team_h']
-            difficulty = f['team_h_difficulty'] if is_home else f['team_a_difficulty']
-            
-            # Get team names
-            team_name = get_team_name(team_id, teams)
-            opp_name = get_team_name(opp_id, teams)
-            
-            # Map to openfootball format
-            team_name_mapped = map_team_name(team_name)
-            opp_name_mapped = map_team_name(opp_name)
-            
-            # Get head-to-head data
-            h2h_matches = find_head_to_head_matches(team_name_mapped, opp_name_mapped, historical_matches)
-            h2h_data = format_h2h_data(h2h_matches, team_name_mapped)
-            
-            # Debug: print what we're looking for
-            print(f"Looking for H2H: {team_name_mapped} vs {opp_name_mapped}")
-            print(f"Found {len(h2h_matches)} matches")
-            
-            fixture_data = OrderedDict([
-                ("opponent", opp_name),
-                ("home", is_home),
-                ("kickoff_time", f['kickoff_time']),
-                ("label", fdr_labels.get(difficulty, "Unknown")),
-                ("difficulty", difficulty)
-            ])
-            
-            if h2h_data:
-                fixture_data["head_to_head"] = h2h_data
-            
-            upcoming.append(fixture_data)
-    
-    upcoming = sorted(upcoming, key=lambda x: x['kickoff_time'])[:4]
+    for f in fixture_index.upcoming(team_id, now=now):
+        is_home = f['team_h'] == team_id
+        opp_id = f['team_a'] if is_home else f['team_h']
+        difficulty = f['team_h_difficulty'] if is_home else f['team_a_difficulty']
+
+        opponent = team_table.get(opp_id)
+
+        # Get head-to-head data
+        h2h_matches = find_head_to_head_matches(team, opponent, h2h_index)
+        h2h_data = format_h2h_data(h2h_matches, team.of_name)
+
+        fixture_data = {
+            "opponent": opponent.name,
+            "home": is_home,
+            "kickoff_time": f['kickoff_time'],
+            "label": fdr_labels.get(difficulty, "Unknown"),
+            "difficulty": difficulty
+        }
+
+        if h2h_data:
+            fixture_data["head_to_head"] = h2h_data
+
+        upcoming.append(fixture_data)
+
     return upcoming
 
 # Count FDR labels
@@ -299,6 +1412,173 @@ def summarize_difficulty(fixtures):
         counts[label] = counts.get(label, 0) + 1
     return ", ".join([f"{v} {k.lower()}" for k, v in counts.items()])
 
+# The "summary" and serialized "fixtures" block of a team, shared by every player on
+# it. Built on first use within a snapshot and keyed by the position of the team's
+# next fixture, so a block rolls forward as kickoffs pass. Both the compact and the
+# pretty JSON are kept; the pretty one is pre-indented for its place in the /compare
+# response (a value two levels deep).
+class FixtureFragments:
+    def __init__(self, fixture_index, team_table, h2h_index):
+        self.fixture_index = fixture_index
+        self.team_table = team_table
+        self.h2h_index = h2h_index
+        self.blocks = {}
+
+    # (summary, compact fixtures JSON, pretty fixtures JSON)
+    def get(self, team_id, now=None):
+        now = now or fpl_now()
+        key = (team_id, self.fixture_index.position(team_id, now))
+        block = self.blocks.get(key)
+        if block is None:
+            next_games = get_next_fixtures(team_id, self.fixture_index, self.team_table, self.h2h_index, now)
+            block = self.blocks[key] = fixture_block(next_games)
+        return block
+
+# (summary, compact JSON, pretty JSON) for a list of upcoming fixtures
+def fixture_block(next_games):
+    return (
+        summarize_difficulty(next_games),
+        dumps(next_games),
+        dumps(next_games, pretty=True).replace(b'\n', b'\n    ')
+    )
+
+# Serialize one /compare result entry. Player entries carry their team's cached
+# fixtures block under the '_fixtures' key, spliced in after the per-player fields
+# instead of being re-encoded. Pretty entries are indented for their place in the array.
+def render_result(result, pretty=False):
+    block = result.pop('_fixtures', None)
+    if not pretty:
+        item = dumps(result)
+        if block is not None:
+            item = item[:-1] + b',"fixtures":' + block[1] + b'}'
+        return item
+    item = dumps(result, pretty=True).replace(b'\n', b'\n  ')
+    if block is not None:
+        item = item[:-4] + b',\n    "fixtures": ' + block[2] + b'\n  }'
+    return b'  ' + item
+
+# Serialize /compare results as a JSON array, one chunk per entry, so a response
+# can be streamed without holding the whole document
+def stream_results(results, pretty=False):
+    opening, separator, closing = (b'[\n', b',\n', b'\n]') if pretty else (b'[', b',', b']')
+    prefix = opening
+    for result in results:
+        yield prefix + render_result(result, pretty)
+        prefix = separator
+    yield closing if prefix is not opening else b'[]'
+
+def render_results(results, pretty=False):
+    return b''.join(stream_results(results, pretty))
+
+# Rendered /compare bodies for the current snapshot, least recently used first. Keyed
+# by what the body depends on once names are resolved: the fixture window, the history
+# seasons loaded (a worker can gain them without a new snapshot version), the output
+# format and the matched player ids in request order (unmatched names stand for
+# themselves), so "Haaland,Salah" and "haaland, salah" share an entry. Bounded by the
+# bytes held, including compressed variants; emptied when a newer snapshot arrives.
+COMPARE_CACHE_MAX_BYTES = int(os.environ.get('COMPARE_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+class ResponseCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Start over for a newer snapshot; False if version is older than the cached one
+    def sync(self, version):
+        if self.version is None or version > self.version:
+            self.version = version
+            self.entries.clear()
+            self.bytes = 0
+        return version == self.version
+
+    def get(self, version, key):
+        with self.lock:
+            entry = self.entries.get(key) if self.sync(version) else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, version, key, body):
+        size = body.size()
+        with self.lock:
+            if size > self.max_bytes or not self.sync(version) or key in self.entries:
+                return
+            self.entries[key] = (body, size)
+            self.bytes += size
+            self.evict()
+
+    # The body in the given coding, compressing it on first use and counting the new
+    # variant against the cap
+    def encoded(self, key, body, encoding):
+        if encoding is None or encoding in body.variants:
+            return body.get(encoding)
+        data = body.get(encoding)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is body:
+                size = body.size()
+                self.entries[key] = (body, size)
+                self.bytes += size - entry[1]
+                self.evict()
+        return data
+
+    def evict(self):
+        while self.bytes > self.max_bytes and self.entries:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "snapshot_version": self.version,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions
+            }
+
+compare_cache = ResponseCache(COMPARE_CACHE_MAX_BYTES)
+
+# Strong ETag for a /compare response. The body is a function of the snapshot data,
+# the head-to-head seasons loaded (a per-process state), how many fixtures
+# have kicked off (upcoming fixtures roll forward within a snapshot), the output
+# format and the requested names in order, so it can be computed before any work.
+def compare_etag(snapshot, now, names, output):
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(f"{snapshot.fingerprint}:{','.join(snapshot.h2h.seasons)}:"
+                  f"{snapshot.fixtures.epoch(now)}:{output}:".encode())
+    digest.update('\x1f'.join(names).encode())
+    return digest.hexdigest()
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Output format requested for /compare: 'ndjson' (via ?format=ndjson or an Accept header
+# preferring application/x-ndjson), 'pretty' (?pretty=1) or compact 'json'
+def compare_output():
+    if (request.args.get('format') == 'ndjson'
+            or request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE):
+        return 'ndjson'
+    return 'pretty' if request.args.get('pretty') == '1' else 'json'
+
+# Serialize /compare results as newline-delimited JSON, one compact entry per line
+def stream_ndjson(results):
+    for result in results:
+        yield render_result(result) + b'\n'
+
 # Main endpoint
 @app.route('/compare', methods=['GET'])
 def compare_players():
@@ -308,51 +1588,184 @@ def compare_players():
             return jsonify({"error": "Missing 'players' parameter"}), 400
 
         names = [n.strip() for n in query.split(",")]
-        players, teams, fixtures = load_fpl_data()
-        
-        if not players:
+        output = compare_output()
+        pretty = output == 'pretty'
+        snapshot, data_age = fpl_cache.get()
+        if snapshot is None:
             return jsonify({"error": "Unable to load FPL data. Please try again later."}), 500
 
-        # Load historical data once for all players
-        historical_matches = load_historical_data()
-
-        results = []
-        for name in names:
-            player, suggestion = match_player(name, players)
-            if player:
-                team_name = get_team_name(player['team'], teams)
-                next_games = get_next_fixtures(player['team'], fixtures, teams, historical_matches)
-                summary = summarize_difficulty(next_games)
-
-                player_data = OrderedDict([
-                    ("player", f"{player['first_name']} {player['second_name']}"),
-                    ("team", team_name),
-                    ("price", player['now_cost'] / 10),
-                    ("ppg", float(player['points_per_game'])),
-                    ("status", player['status']),
-                    ("summary", summary),
-                    ("fixtures", next_games)
-                ])
-                results.append(player_data)
+        now = fpl_now()
+        etag = compare_etag(snapshot, now, names, output)
+        # Each content coding is a separate representation with its own tag
+        known = [tag for tag in [etag] + [f"{etag}-{e}" for e in CONTENT_ENCODINGS] if request.if_none_match.contains_weak(tag)]
+        if known:
+            response = Flask.response_class(status=304)
+            response.set_etag(known[0])
+        elif output == 'ndjson':
+            # Streamed uncached, each name matched just before its line is written
+            results = (compare_entry(snapshot, name, *match_player(name, snapshot.names), now) for name in names)
+            response, encoding = streamed_response(stream_ndjson(results), NDJSON_MIMETYPE)
+            response.set_etag(etag if encoding is None else f"{etag}-{encoding}")
+        else:
+            matches = [match_player(name, snapshot.names) for name in names]
+            key = (snapshot.fixtures.epoch(now), snapshot.h2h.seasons, pretty, tuple(
+                snapshot.players.id[row] if row is not None else name
+                for name, (row, _) in zip(names, matches)
+            ))
+            body = compare_cache.get(snapshot.version, key)
+            if body is None:
+                body = EncodedBody(render_results(compare_results(snapshot, names, matches, now), pretty))
+                compare_cache.put(snapshot.version, key, body)
+            encoding = negotiate_encoding(len(body.data))
+            response = Flask.response_class(compare_cache.encoded(key, body, encoding), mimetype='application/json')
+            if encoding is not None:
+                response.headers['Content-Encoding'] = encoding
+                response.set_etag(f"{etag}-{encoding}")
             else:
-                msg = {
-                    "error": f"No match for '{name}'"
-                }
-                if suggestion:
-                    msg["suggestion"] = suggestion
-                results.append(msg)
+                response.set_etag(etag)
+        # Clients may keep the body but must revalidate it before every reuse
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+        response.headers['X-Data-Age'] = str(int(data_age))
+        response.headers['X-Snapshot-Version'] = str(snapshot.version)
+        return response
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
 
-        response = Flask.response_class(
-            json.dumps(results, cls=OrderedJSONEncoder, indent=2),
-            mimetype='application/json'
-        )
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
+# One result entry per requested name, in request order, from its match_player result
+def compare_results(snapshot, names, matches, now):
+    for name, (row, suggestion) in zip(names, matches):
+        yield compare_entry(snapshot, name, row, suggestion, now)
+
+# Result entry for a matched player row, or the error for an unmatched name
+def compare_entry(snapshot, name, row, suggestion, now):
+    if row is None:
+        msg = {
+            "error": f"No match for '{name}'"
+        }
+        if suggestion:
+            msg["suggestion"] = suggestion
+        return msg
+
+    players = snapshot.players
+    team_id = players.team[row]
+    block = snapshot.fragments.get(team_id, now)
+    return {
+        "player": f"{players.first_name[row]} {players.second_name[row]}",
+        "team": snapshot.teams.get(team_id).name,
+        "price": players.now_cost[row] / 10,
+        "ppg": players.points_per_game[row],
+        "status": players.status[row],
+        "summary": block[0],
+        "_fixtures": block
+    }
+
+# Largest batch accepted by POST /compare
+COMPARE_MAX_BATCH = int(os.environ.get('COMPARE_MAX_BATCH', 1000))
+
+# Bulk endpoint: the body is a JSON array of player names and/or FPL element ids.
+# Everything is resolved in one pass before streaming starts; a player requested more
+# than once is reported once, at its first position, and each team's fixtures block
+# is built at most once per snapshot (see FixtureFragments).
+@app.route('/compare', methods=['POST'])
+def compare_players_bulk():
+    try:
+        refs = request.get_json(silent=True)
+        if not isinstance(refs, list) or not refs:
+            return jsonify({"error": "Expected a non-empty JSON array of player names or ids"}), 400
+        if len(refs) > COMPARE_MAX_BATCH:
+            return jsonify({"error": f"At most {COMPARE_MAX_BATCH} players per request"}), 400
+        if any(isinstance(ref, bool) or not isinstance(ref, (str, int)) for ref in refs):
+            return jsonify({"error": "Players must be given as names or integer ids"}), 400
+
+        snapshot, data_age = fpl_cache.get()
+        if snapshot is None:
+            return jsonify({"error": "Unable to load FPL data. Please try again later."}), 500
+
+        seen = set()
+        entries = []
+        for ref in refs:
+            if isinstance(ref, int):
+                row = snapshot.players.row_for_id(ref)
+                name, suggestion = str(ref), None
+            else:
+                name = ref.strip()
+                row, suggestion = match_player(name, snapshot.names)
+            key = row if row is not None else ('name', name)
+            if key not in seen:
+                seen.add(key)
+                entries.append((name, row, suggestion))
+
+        now = fpl_now()
+        output = compare_output()
+        results = (compare_entry(snapshot, name, row, suggestion, now) for name, row, suggestion in entries)
+        if output == 'ndjson':
+            response, _ = streamed_response(stream_ndjson(results), NDJSON_MIMETYPE)
+        else:
+            response, _ = streamed_response(stream_results(results, output == 'pretty'), 'application/json')
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['X-Data-Age'] = str(int(data_age))
+        response.headers['X-Snapshot-Version'] = str(snapshot.version)
         return response
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+# Most results returned by /players/search
+SEARCH_MAX_LIMIT = 50
+
+# Autocomplete: players whose full, web or surname starts with q, most selected first
+@app.route('/players/search')
+def search_players():
+    try:
+        query = normalize(request.args.get('q', ''))
+        if not query:
+            return jsonify({"error": "Missing 'q' parameter"}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), SEARCH_MAX_LIMIT)
+        except ValueError:
+            return jsonify({"error": "'limit' must be an integer"}), 400
+
+        snapshot, data_age = fpl_cache.get()
+        if snapshot is None:
+            return jsonify({"error": "Unable to load FPL data. Please try again later."}), 500
+
+        players = snapshot.players
+        results = [
+            {
+                "id": players.id[row],
+                "player": f"{players.first_name[row]} {players.second_name[row]}",
+                "web_name": players.web_name[row],
+                "team": snapshot.teams.get(players.team[row]).name,
+                "price": players.now_cost[row] / 10,
+                "selected_by_percent": players.selected_by_percent[row]
+            }
+            for row in snapshot.names.complete(query, limit)
+        ]
+        response = jsonify({"query": query, "results": results})
+        response.headers['X-Data-Age'] = str(int(data_age))
+        response.headers['X-Snapshot-Version'] = str(snapshot.version)
+        return response
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+# Load the snapshot, which build_snapshot has already warmed, before serving. Under
+# gunicorn --preload this runs once in the master and the forked workers share the
+# result copy-on-write.
+def warm_up():
+    snapshot, _ = fpl_cache.get()
+    # Park everything loaded so far in the permanent generation, so collections in
+    # the workers don't write to (and so copy) the shared pages
+    gc.freeze()
+    return snapshot is not None
+
+os.register_at_fork(after_in_child=upstream.reset)
+
+# Warm up when the process starts rather than on the first request
+if os.environ.get('SNAPSHOT_PRELOAD', '1') == '1':
+    warm_up()
+elif os.environ.get('HISTORY_PRELOAD', '1') == '1':
+    get_h2h_index()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
     app.run(host='0.0.0.0', port=port, debug=False) 
\ No newline at end of file
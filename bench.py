@@ -0,0 +1,100 @@
+# Benchmark /compare serialization on a typical 15-player payload:
+#   python bench.py [iterations] > bench_output.txt
+import os
+import sys
+import json
+import timeit
+from collections import OrderedDict
+
+# Import the app without loading anything from upstream
+os.environ.setdefault('SNAPSHOT_PRELOAD', '0')
+os.environ.setdefault('HISTORY_PRELOAD', '0')
+import app
+
+PLAYERS = 15
+
+# A fixture entry shaped like get_next_fixtures() output, with a full H2H block
+def sample_fixture(i):
+    return {
+        "opponent": f"Opponent {i}",
+        "home": i % 2 == 0,
+        "kickoff_time": f"2026-10-{18 + i:02d}T14:00:00Z",
+        "label": app.fdr_labels[2 + i % 4],
+        "difficulty": 2 + i % 4,
+        "head_to_head": {
+            "summary": "2 wins, 1 draw, 1 loss",
+            "matches": [
+                {
+                    "date": f"202{j}-0{j + 1}-14",
+                    "season": f"202{j - 1}/2{j}",
+                    "result": "WDLW"[j],
+                    "venue": "home" if j % 2 else "away",
+                    "full_time_score": f"{j}-{3 - j}"
+                }
+                for j in range(4)
+            ]
+        }
+    }
+
+# 15 players spread over 8 teams, as a squad comparison typically is
+def sample_results():
+    teams = [[sample_fixture(t + i) for i in range(app.NEXT_FIXTURES)] for t in range(8)]
+    return [
+        {
+            "player": f"Player Número {i}",
+            "team": f"Team {i % 8}",
+            "price": 4.5 + i / 2,
+            "ppg": 3.1 + i / 10,
+            "status": "a",
+            "summary": "2 easy, 1 medium, 1 hard",
+            "fixtures": teams[i % 8]
+        }
+        for i in range(PLAYERS)
+    ]
+
+# The encoder the app used before
+class OrderedJSONEncoder(json.JSONEncoder):
+    def encode(self, obj):
+        if isinstance(obj, OrderedDict):
+            return '{' + ','.join(f'"{k}":{self.encode(v)}' for k, v in obj.items()) + '}'
+        return super().encode(obj)
+
+def legacy(results):
+    results = [OrderedDict(r) for r in results]
+    return json.dumps(results, cls=OrderedJSONEncoder, indent=2).encode()
+
+# The /compare path: each team's fixture block is encoded once per snapshot and
+# spliced into every response
+def spliced(results, pretty=False):
+    blocks = {}
+    for r in results:
+        fixtures = r['fixtures']
+        blocks[r['team']] = app.fixture_block(fixtures)
+    def run():
+        entries = [{k: v for k, v in r.items() if k != 'fixtures'} for r in results]
+        for entry in entries:
+            entry['_fixtures'] = blocks[entry['team']]
+        return app.render_results(entries, pretty)
+    return run
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    results = sample_results()
+    backend = 'orjson' if app.orjson is not None else 'stdlib json'
+    cases = [
+        ("legacy json.dumps(indent=2)", lambda: legacy(results)),
+        (f"dumps compact ({backend})", lambda: app.dumps(results)),
+        (f"dumps pretty ({backend})", lambda: app.dumps(results, pretty=True)),
+        ("render_results compact", spliced(results)),
+        ("render_results pretty", spliced(results, pretty=True))
+    ]
+    print(f"{PLAYERS}-player /compare payload, {iterations} iterations")
+    baseline = None
+    for label, fn in cases:
+        size = len(fn())
+        per_call = min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations
+        baseline = baseline or per_call
+        print(f"{label:<36} {per_call * 1e6:9.1f} us  {size:7d} bytes  {baseline / per_call:5.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# History that loads only partly is served but not kept, and is retried until every
+# season is in.
+#   python -m unittest discover tests
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# Import the app without loading anything from upstream
+os.environ['SNAPSHOT_PRELOAD'] = '0'
+os.environ['HISTORY_PRELOAD'] = '0'
+os.environ['HISTORY_CACHE_DIR'] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app
+
+def season(code):
+    year = int(code[:4])
+    return {"matches": [
+        {"date": f"{year}-09-01", "team1": "Arsenal FC", "team2": "Fulham FC", "score": {"ft": [2, 1]}}
+    ]}
+
+# load_season stand-in that raises for the given seasons
+def seasons_failing(*codes):
+    def load(code):
+        if code in codes:
+            raise RuntimeError(f"{code} unavailable")
+        return season(code)
+    return load
+
+class HistoryRetryTest(unittest.TestCase):
+    def setUp(self):
+        app.h2h_index_cache = None
+
+    def tearDown(self):
+        app.h2h_index_cache = None
+
+    def test_partial_history_is_retried(self):
+        with mock.patch.object(app, 'load_season', seasons_failing('2022-23')):
+            partial = app.get_h2h_index()
+        self.assertEqual(partial.seasons, ('2023/24',))
+        self.assertFalse(partial.complete)
+        self.assertIsNone(app.h2h_index_cache)
+
+        with mock.patch.object(app, 'load_season', seasons_failing()):
+            complete = app.next_h2h_index(partial)
+        self.assertEqual(complete.seasons, ('2023/24', '2022/23'))
+        self.assertTrue(complete.complete)
+        self.assertIs(app.h2h_index_cache, complete)
+
+    def test_retry_without_new_seasons_keeps_previous(self):
+        with mock.patch.object(app, 'load_season', seasons_failing('2022-23')):
+            partial = app.get_h2h_index()
+            self.assertIs(app.next_h2h_index(partial), partial)
+
+    def test_complete_history_is_not_reloaded(self):
+        with mock.patch.object(app, 'load_season', seasons_failing()):
+            complete = app.get_h2h_index()
+        with mock.patch.object(app, 'load_season', side_effect=AssertionError("reloaded")):
+            self.assertIs(app.next_h2h_index(complete), complete)
+            self.assertIs(app.get_h2h_index(), complete)
+
+    def test_no_history_is_empty(self):
+        with mock.patch.object(app, 'load_season', seasons_failing('2023-24', '2022-23')):
+            self.assertIs(app.get_h2h_index(), app.EMPTY_H2H_INDEX)
+        self.assertFalse(app.EMPTY_H2H_INDEX.complete)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# /compare splices cached fixture JSON into each entry at fixed byte offsets; check the
+# result is byte-for-byte what encoding the whole document would give, for compact and
+# pretty output and with both the orjson and the stdlib backend.
+#   python -m unittest discover tests
+import os
+import sys
+import unittest
+import importlib.util
+
+# Import the app without loading anything from upstream
+os.environ['SNAPSHOT_PRELOAD'] = '0'
+os.environ['HISTORY_PRELOAD'] = '0'
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+# A fresh copy of app.py, optionally with orjson hidden so the stdlib encoder is used
+def load_app(name, without_orjson=False):
+    saved = sys.modules.get('orjson')
+    if without_orjson:
+        sys.modules['orjson'] = None
+    try:
+        spec = importlib.util.spec_from_file_location(name, APP_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        if without_orjson:
+            if saved is None:
+                del sys.modules['orjson']
+            else:
+                sys.modules['orjson'] = saved
+
+def sample_fixtures(n, with_h2h=True):
+    fixtures = []
+    for i in range(n):
+        fixture = {
+            "opponent": ["Brighton & Hove Albion", "Nott'm \"Forest\"", "Wolves"][i % 3],
+            "home": i % 2 == 0,
+            "kickoff_time": f"2026-10-{18 + i:02d}T14:00:00Z",
+            "label": "Evenly Matched",
+            "difficulty": 3
+        }
+        if with_h2h:
+            fixture["head_to_head"] = {
+                "summary": "1 win, 1 draw",
+                "matches": [
+                    {"date": "2024-02-11", "season": "2023/24", "result": "W", "venue": "home", "full_time_score": "2-0"},
+                    {"date": "2023-09-30", "season": "2023/24", "result": "D", "venue": "away", "full_time_score": "1-1"}
+                ]
+            }
+        fixtures.append(fixture)
+    return fixtures
+
+# Full results as /compare documents them, in every shape an entry can take
+def sample_results():
+    return [
+        {"player": "Martin Ødegaard", "team": "Arsenal", "price": 8.5, "ppg": 5.4, "status": "a",
+         "summary": "4 evenly matched", "fixtures": sample_fixtures(4)},
+        {"error": "No match for 'Xyzzy'"},
+        {"player": "Erling Haaland", "team": "Man City", "price": 14.0, "ppg": 7.0, "status": "d",
+         "summary": "", "fixtures": []},
+        {"error": "No match for 'Havrtz'", "suggestion": "havertz"},
+        {"player": "Bukayo Saka", "team": "Arsenal", "price": 10.0, "ppg": 6.1, "status": "a",
+         "summary": "1 evenly matched", "fixtures": sample_fixtures(1, with_h2h=False)}
+    ]
+
+# The same results with fixtures replaced by cached blocks, as compare_entry builds them
+def spliced(app, results):
+    entries = []
+    for result in results:
+        entry = dict(result)
+        if 'fixtures' in entry:
+            entry['_fixtures'] = app.fixture_block(entry.pop('fixtures'))
+        entries.append(entry)
+    return entries
+
+class RenderResultsTest:
+    app = None
+
+    def test_compact_matches_dumps(self):
+        results = sample_results()
+        self.assertEqual(self.app.render_results(spliced(self.app, results)), self.app.dumps(results))
+
+    def test_pretty_matches_dumps(self):
+        results = sample_results()
+        self.assertEqual(self.app.render_results(spliced(self.app, results), pretty=True),
+                         self.app.dumps(results, pretty=True))
+
+    def test_single_entry(self):
+        for pretty in (False, True):
+            results = sample_results()[:1]
+            self.assertEqual(self.app.render_results(spliced(self.app, results), pretty),
+                             self.app.dumps(results, pretty=pretty))
+
+    def test_empty(self):
+        for pretty in (False, True):
+            self.assertEqual(self.app.render_results([], pretty), self.app.dumps([], pretty=pretty))
+
+    def test_ndjson_lines_match_dumps(self):
+        results = sample_results()
+        lines = b''.join(self.app.stream_ndjson(spliced(self.app, results))).split(b'\n')
+        self.assertEqual(lines, [self.app.dumps(result) for result in results] + [b''])
+
+@unittest.skipIf(importlib.util.find_spec('orjson') is None, "orjson is not installed")
+class OrjsonRenderTest(RenderResultsTest, unittest.TestCase):
+    app = load_app('app_orjson') if importlib.util.find_spec('orjson') else None
+
+class StdlibRenderTest(RenderResultsTest, unittest.TestCase):
+    app = load_app('app_stdlib', without_orjson=True)
+
+if __name__ == '__main__':
+    unittest.main()
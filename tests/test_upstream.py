@@ -0,0 +1,102 @@
+# Upstream validators travel with the snapshot sources, so a payload fetched by a
+# refresh that then failed is fetched again instead of being answered with a 304.
+#   python -m unittest discover tests
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+
+# Import the app without loading anything from upstream
+os.environ['SNAPSHOT_PRELOAD'] = '0'
+os.environ['HISTORY_PRELOAD'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app
+import requests
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200, etag=None):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode() if payload is not None else b''
+        self.headers = {'ETag': etag} if etag else {}
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+def bootstrap(player_ids):
+    return {
+        "elements": [
+            {"id": i, "first_name": "First", "second_name": f"Player{i}", "web_name": f"P{i}", "team": 1,
+             "now_cost": 50, "points_per_game": "4.0", "status": "a", "selected_by_percent": "1.0"}
+            for i in player_ids
+        ],
+        "teams": [{"id": 1, "name": "Arsenal", "short_name": "ARS"}],
+        "events": []
+    }
+
+FIXTURES = [{"id": 1, "event": 1, "team_h": 1, "team_a": 1, "team_h_difficulty": 3, "team_a_difficulty": 3,
+             "kickoff_time": None, "finished": False}]
+
+# Upstream serving one version of each payload, honouring If-None-Match. A URL in
+# failing raises instead, as a timeout would.
+class FakeUpstream:
+    def __init__(self):
+        self.payloads = {app.FPL_BOOTSTRAP_URL: (bootstrap([1]), '"s1"'), app.FPL_FIXTURES_URL: (FIXTURES, '"f1"')}
+        self.failing = set()
+        self.sent = []
+
+    def get(self, url, timeout=None, headers=None):
+        self.sent.append((url, (headers or {}).get('If-None-Match')))
+        if url in self.failing:
+            raise requests.Timeout(url)
+        payload, etag = self.payloads[url]
+        if headers and headers.get('If-None-Match') == etag:
+            return FakeResponse(None, 304, etag)
+        return FakeResponse(payload, 200, etag)
+
+class ValidatorsTest(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeUpstream()
+        patcher = mock.patch.object(app.upstream.session, 'get', self.upstream.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_refresh_does_not_hide_a_change(self):
+        first = app.load_fpl_data()
+        self.assertEqual(list(first['players'].id), [1])
+
+        # bootstrap-static changes, but the refresh fails on fixtures and is discarded
+        self.upstream.payloads[app.FPL_BOOTSTRAP_URL] = (bootstrap([1, 2]), '"s2"')
+        self.upstream.failing.add(app.FPL_FIXTURES_URL)
+        self.assertIsNone(app.load_fpl_data(first))
+
+        # The next refresh still asks relative to the snapshot actually in use
+        self.upstream.failing.clear()
+        self.upstream.sent.clear()
+        second = app.load_fpl_data(first)
+        self.assertIn((app.FPL_BOOTSTRAP_URL, '"s1"'), self.upstream.sent)
+        self.assertEqual(list(second['players'].id), [1, 2])
+        self.assertIs(second['fixtures'], first['fixtures'])
+        self.assertEqual(second['validators'][app.FPL_BOOTSTRAP_URL][0], '"s2"')
+
+    def test_empty_elements_does_not_hide_a_change(self):
+        first = app.load_fpl_data()
+        self.upstream.payloads[app.FPL_BOOTSTRAP_URL] = (bootstrap([]), '"s2"')
+        self.assertIsNone(app.load_fpl_data(first))
+
+        self.upstream.payloads[app.FPL_BOOTSTRAP_URL] = (bootstrap([1, 2]), '"s2"')
+        second = app.load_fpl_data(first)
+        self.assertIsNot(second, app.NOT_MODIFIED)
+        self.assertEqual(list(second['players'].id), [1, 2])
+
+    def test_unchanged_upstream_is_not_modified(self):
+        first = app.load_fpl_data()
+        self.assertIs(app.load_fpl_data(first), app.NOT_MODIFIED)
+
+if __name__ == '__main__':
+    unittest.main()